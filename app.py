@@ -1,123 +1,260 @@
 # app.py
 from flask import Flask, request, jsonify
+from flask.json.provider import JSONProvider
 import os
+import sys
+import io
+import re
 import time
-import json
 import hashlib
 import hmac
 import base64
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import threading
 import traceback
+import tempfile
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+import httpx
+import orjson
+import msgspec
+from diskcache import Cache
+from cachetools import TTLCache
 from openai import OpenAI
 
+
+class ORJSONProvider(JSONProvider):
+    # jsonify / request.get_json via orjson (UTF-8 natif, sans ensure_ascii)
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 
 # -------------------------
 # CONFIG
 # -------------------------
 DEFAULT_LANGS = ["en", "fr", "es", "it", "fa", "de"]
+# Listes courantes partagées (préfixes de DEFAULT_LANGS) : évite une liste par requête
+_COMMON_LANG_TUPLES = {tuple(DEFAULT_LANGS[:n]): DEFAULT_LANGS[:n] for n in range(1, len(DEFAULT_LANGS) + 1)}
 MODEL_NAME = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
 
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+if not OPENAI_API_KEY:
+    raise RuntimeError("OPENAI_API_KEY not set")
+
+# LINE est optionnel (/translate fonctionne sans) : lu une fois au démarrage
+LINE_CHANNEL_ACCESS_TOKEN = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN", "")
+LINE_CHANNEL_SECRET = os.environ.get("LINE_CHANNEL_SECRET", "")
+
 CACHE_TTL_SECONDS = int(os.environ.get("CACHE_TTL_SECONDS", "86400"))  # 24h
-CACHE_MAX_ITEMS = int(os.environ.get("CACHE_MAX_ITEMS", "2000"))
+CACHE_DIR = os.environ.get("CACHE_DIR", "/tmp/translator-cache")
+CACHE_BYTES = int(os.environ.get("CACHE_BYTES", "500000000"))  # 500 MB
 
 PROFILE_CACHE_TTL_SECONDS = int(os.environ.get("PROFILE_CACHE_TTL_SECONDS", "86400"))  # 24h
-
-CACHE = {}          # {cache_key: (expires_at, payload_dict)}
-PROFILE_CACHE = {}  # {user_id: (expires_at, profile_dict)}
+PROFILE_CACHE_MAX_ITEMS = int(os.environ.get("PROFILE_CACHE_MAX_ITEMS", "10000"))
+
+# Batches soumis mais jamais interrogés : oubliés après la fenêtre de 24h (+ marge)
+BATCH_JOBS_TTL_SECONDS = int(os.environ.get("BATCH_JOBS_TTL_SECONDS", "172800"))  # 48h
+BATCH_JOBS_MAX_ITEMS = int(os.environ.get("BATCH_JOBS_MAX_ITEMS", "1000"))
+
+# Texte tronqué avant prompt (LINE autorise 5000 caractères) : borne latence et tokens
+MAX_TEXT_CHARS = int(os.environ.get("MAX_TEXT_CHARS", "2000"))
+
+# Corps de requête : au-delà, 413 levé à la première lecture du corps par la route
+# (request.data / get_data()), pas avant l'appel de la route
+MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", str(256 * 1024)))
+WEBHOOK_MAX_BYTES = int(os.environ.get("WEBHOOK_MAX_BYTES", str(64 * 1024)))  # avant HMAC / parsing JSON
+app.config["MAX_CONTENT_LENGTH"] = MAX_CONTENT_LENGTH
+
+# Max OpenAI calls in flight per process (webhook events each run in their own thread)
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
+# Retries gérés par le SDK (429, timeouts, erreurs réseau, 5xx) : backoff exponentiel + jitter, respecte Retry-After
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "3"))
+# Pool httpx (HTTP/2 : plusieurs requêtes multiplexées par connexion)
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", "64"))
+OPENAI_MAX_KEEPALIVE = int(os.environ.get("OPENAI_MAX_KEEPALIVE", "32"))
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", "60"))
+
+# Traitement des webhooks LINE hors du thread de requête
+TRANSLATE_WORKERS = int(os.environ.get("TRANSLATE_WORKERS", "8"))
+TRANSLATE_QUEUE_MAX = int(os.environ.get("TRANSLATE_QUEUE_MAX", "100"))  # livraisons en attente/en cours
+BUSY_MESSAGE = "Service busy, please try again in a moment."
+
+# /translate?mode=throughput : fenêtre de regroupement des requêtes en un seul appel
+COALESCE_MS = int(os.environ.get("COALESCE_MS", "25"))
+COALESCE_MAX_ITEMS = int(os.environ.get("COALESCE_MAX_ITEMS", "16"))
+
+# SQLite sur disque : survit aux redémarrages et partagé entre les workers gunicorn
+CACHE = Cache(CACHE_DIR, size_limit=CACHE_BYTES, eviction_policy="least-recently-used")  # {cache_key: translation}
+PROFILE_CACHE = TTLCache(maxsize=PROFILE_CACHE_MAX_ITEMS, ttl=PROFILE_CACHE_TTL_SECONDS)  # {user_id: profile_dict}
+BATCH_JOBS = TTLCache(maxsize=BATCH_JOBS_MAX_ITEMS, ttl=BATCH_JOBS_TTL_SECONDS)  # {batch_id: {custom_id: (text, ordered_langs)}}
+INFLIGHT = {}       # {key: Future} appels en cours (singleflight)
+
+_PROFILE_CACHE_LOCK = threading.RLock()
+_BATCH_JOBS_LOCK = threading.Lock()
+_INFLIGHT_LOCK = threading.Lock()
+_OPENAI_SEMAPHORE = threading.BoundedSemaphore(OPENAI_MAX_CONCURRENCY)
+
+# Session LINE partagée : connexions TCP+TLS keep-alive vers api.line.me.
+# Retry sur GET uniquement (méthodes idempotentes par défaut) : un reply/push
+# n'est jamais renvoyé en double.
+LINE_SESSION = requests.Session()
+LINE_SESSION.headers["User-Agent"] = "multilang-translator"
+LINE_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False),
+))
+
+EXECUTOR = ThreadPoolExecutor(max_workers=TRANSLATE_WORKERS, thread_name_prefix="translate")
+_QUEUE_SLOTS = threading.BoundedSemaphore(TRANSLATE_QUEUE_MAX)
+
+
+# Un seul client (pool de connexions keep-alive partagé entre les requêtes),
+# HTTP/2 pour multiplexer les appels concurrents sur une même connexion TLS.
+# Créé au premier usage ; _get_openai_client.cache_clear() pour le reconstruire.
+@lru_cache(maxsize=1)
+def _get_openai_client() -> OpenAI:
+    http_client = httpx.Client(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=60,
+        ),
+        timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=5.0),
+    )
+    return OpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=http_client,
+        max_retries=OPENAI_MAX_RETRIES,
+    )
 
 
 # -------------------------
-# TIME / CACHE
+# CACHE
 # -------------------------
-def _now() -> float:
-    return time.time()
+def _text_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
 
 
-def _make_cache_key(author: str, text: str, languages: list[str]) -> str:
-    raw = json.dumps(
-        {"author": author, "text": text, "languages": languages},
-        ensure_ascii=False,
-        sort_keys=True,
-    )
-    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+def _make_cache_key(digest: str, lang: str) -> str:
+    # L'auteur n'influe pas sur la traduction : clé = (texte, langue).
+    # Le texte est haché une seule fois (digest), la langue est simplement suffixée.
+    return f"{digest}:{lang}"
 
 
-def _cache_get(key: str):
-    item = CACHE.get(key)
-    if not item:
-        return None
-    expires_at, payload = item
-    if _now() >= expires_at:
-        CACHE.pop(key, None)
-        return None
-    return payload
+def _cache_get_many(keys: list[str]) -> dict:
+    hits = {}
+    for key in keys:
+        value = CACHE.get(key)
+        if value is not None:
+            hits[key] = value
+    return hits
 
 
-def _cache_set(key: str, payload: dict):
+def _cache_set_many(items: dict):
     if CACHE_TTL_SECONDS <= 0:
         return
 
-    if len(CACHE) >= CACHE_MAX_ITEMS:
-        cutoff = int(CACHE_MAX_ITEMS * 0.1) or 1
-        for k in list(CACHE.keys())[:cutoff]:
-            CACHE.pop(k, None)
-
-    CACHE[key] = (_now() + CACHE_TTL_SECONDS, payload)
+    with CACHE.transact():
+        for key, value in items.items():
+            CACHE.set(key, value, expire=CACHE_TTL_SECONDS)
 
 
 def _profile_cache_get(user_id: str):
-    item = PROFILE_CACHE.get(user_id)
-    if not item:
-        return None
-    expires_at, profile = item
-    if _now() >= expires_at:
-        PROFILE_CACHE.pop(user_id, None)
-        return None
-    return profile
+    # TTLCache expire et réordonne (LRU) à la lecture : accès sous verrou
+    with _PROFILE_CACHE_LOCK:
+        return PROFILE_CACHE.get(user_id)
 
 
 def _profile_cache_set(user_id: str, profile: dict):
     if PROFILE_CACHE_TTL_SECONDS <= 0:
         return
-    PROFILE_CACHE[user_id] = (_now() + PROFILE_CACHE_TTL_SECONDS, profile)
+
+    with _PROFILE_CACHE_LOCK:
+        PROFILE_CACHE[user_id] = profile
+
+
+def _singleflight_join(key) -> tuple[Future, bool]:
+    # (future, leader) : le premier appelant d'une clé la traite, les suivants attendent
+    with _INFLIGHT_LOCK:
+        future = INFLIGHT.get(key)
+        if future is not None:
+            return future, False
+        future = Future()
+        INFLIGHT[key] = future
+        return future, True
+
+
+def _singleflight_settle(key, future: Future, outcome):
+    # outcome : résultat, ou exception transmise aux appelants en attente
+    with _INFLIGHT_LOCK:
+        INFLIGHT.pop(key, None)
+    if isinstance(outcome, BaseException):
+        future.set_exception(outcome)
+    else:
+        future.set_result(outcome)
+
+
+def _singleflight(key, fn, *args):
+    # Les appels concurrents de même clé attendent le résultat du premier
+    future, leader = _singleflight_join(key)
+    if not leader:
+        return future.result()
+
+    outcome = RuntimeError("singleflight leader interrupted")
+    try:
+        outcome = fn(*args)
+        return outcome
+    except Exception as e:
+        outcome = e
+        raise
+    finally:
+        _singleflight_settle(key, future, outcome)
 
 
 # -------------------------
 # OUTPUT FORMAT (no empty lines)
 # -------------------------
-def _build_line_text(author: str, original_text: str, detected_language: str, translations: dict, ordered_langs: list[str]) -> str:
-    flag_map = {
-        "en": "🇺🇸",
-        "fr": "🇫🇷",
-        "es": "🇪🇸",
-        "it": "🇮🇹",
-        "fa": "🇮🇷",
-        "de": "🇩🇪",
-        "pt": "🇵🇹",
-        "nl": "🇳🇱",
-        "ar": "🇸🇦",
-        "ja": "🇯🇵",
-        "ko": "🇰🇷",
-        "zh": "🇨🇳",
-        "ru": "🇷🇺",
-    }
+_LINE_BREAKS = str.maketrans("\r\n", "  ")
 
-    def clean(s: str) -> str:
-        return (s or "").replace("\n", " ").replace("\r", " ").strip()
+_FLAG_MAP = {
+    "en": "🇺🇸",
+    "fr": "🇫🇷",
+    "es": "🇪🇸",
+    "it": "🇮🇹",
+    "fa": "🇮🇷",
+    "de": "🇩🇪",
+    "pt": "🇵🇹",
+    "nl": "🇳🇱",
+    "ar": "🇸🇦",
+    "ja": "🇯🇵",
+    "ko": "🇰🇷",
+    "zh": "🇨🇳",
+    "ru": "🇷🇺",
+}
 
-    lines = []
-    lines.append(f"👤 {clean(author)}")
-    lines.append(f"🌐 {clean(detected_language)}")
-    lines.append(f"📝 {clean(original_text)}")
 
-    for lang in ordered_langs:
-        flag = flag_map.get(lang.lower(), f"🏳️({lang})")
-        text = clean(translations.get(lang, ""))
-        lines.append(f"{flag} {text}")
+def _clean_line(s: str) -> str:
+    return (s or "").translate(_LINE_BREAKS).strip()
 
-    return "\n".join(lines)
+
+def _build_line_text(author: str, original_text: str, detected_language: str, translations: dict, ordered_langs: list[str]) -> str:
+    header = f"👤 {_clean_line(author)}\n🌐 {_clean_line(detected_language)}\n📝 {_clean_line(original_text)}"
+    body = "\n".join(
+        f"{_FLAG_MAP.get(lang.lower(), f'🏳️({lang})')} {_clean_line(translations.get(lang, ''))}"
+        for lang in ordered_langs
+    )
+    return f"{header}\n{body}" if body else header
 
 
 # -------------------------
@@ -126,7 +263,7 @@ def _build_line_text(author: str, original_text: str, detected_language: str, tr
 def verify_line_signature(raw_body: bytes, signature: str, channel_secret: str) -> bool:
     if not signature or not channel_secret:
         return False
-    mac = hmac.new(channel_secret.encode("utf-8"), raw_body, hashlib.sha256).digest()
+    mac = hmac.digest(channel_secret.encode("utf-8"), raw_body, "sha256")
     expected = base64.b64encode(mac).decode("utf-8")
     return hmac.compare_digest(expected, signature)
 
@@ -139,15 +276,18 @@ def get_line_profile(user_id: str) -> dict:
     if cached:
         return cached
 
-    token = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN")
-    if not token:
+    if not LINE_CHANNEL_ACCESS_TOKEN:
         return {}
 
+    return _singleflight(("profile", user_id), _fetch_line_profile, user_id)
+
+
+def _fetch_line_profile(user_id: str) -> dict:
     url = f"https://api.line.me/v2/bot/profile/{user_id}"
-    headers = {"Authorization": f"Bearer {token}"}
+    headers = {"Authorization": f"Bearer {LINE_CHANNEL_ACCESS_TOKEN}"}
 
     try:
-        r = requests.get(url, headers=headers, timeout=5)
+        r = LINE_SESSION.get(url, headers=headers, timeout=5)
         if r.status_code == 200:
             profile = r.json() or {}
             _profile_cache_set(user_id, profile)
@@ -159,19 +299,18 @@ def get_line_profile(user_id: str) -> dict:
 
 
 def reply_to_line(reply_token: str, text: str) -> bool:
-    token = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN")
-    if not token or not reply_token:
+    if not LINE_CHANNEL_ACCESS_TOKEN or not reply_token:
         return False
 
     url = "https://api.line.me/v2/bot/message/reply"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    headers = {"Authorization": f"Bearer {LINE_CHANNEL_ACCESS_TOKEN}", "Content-Type": "application/json"}
     payload = {
         "replyToken": reply_token,
         "messages": [{"type": "text", "text": text[:4900]}],
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=10)
+        r = LINE_SESSION.post(url, headers=headers, json=payload, timeout=10)
         if r.status_code != 200:
             print("REPLY FAILED:", r.status_code, r.text)
         return r.status_code == 200
@@ -181,19 +320,18 @@ def reply_to_line(reply_token: str, text: str) -> bool:
 
 
 def push_to_line(to_id: str, text: str) -> bool:
-    token = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN")
-    if not token or not to_id:
+    if not LINE_CHANNEL_ACCESS_TOKEN or not to_id:
         return False
 
     url = "https://api.line.me/v2/bot/message/push"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    headers = {"Authorization": f"Bearer {LINE_CHANNEL_ACCESS_TOKEN}", "Content-Type": "application/json"}
     payload = {
         "to": to_id,
         "messages": [{"type": "text", "text": text[:4900]}],
     }
 
     try:
-        r = requests.post(url, headers=headers, json=payload, timeout=10)
+        r = LINE_SESSION.post(url, headers=headers, json=payload, timeout=10)
         if r.status_code != 200:
             print("PUSH FAILED:", r.status_code, r.text)
         return r.status_code == 200
@@ -205,60 +343,119 @@ def push_to_line(to_id: str, text: str) -> bool:
 # -------------------------
 # OPENAI TRANSLATION CORE
 # -------------------------
-def translate_core(author: str, text: str, ordered_langs: list[str], include_line_text: bool = True) -> dict:
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY not set")
-
-    client = OpenAI(api_key=api_key)
-
-    cache_key = _make_cache_key(author, text, ordered_langs)
-    cached = _cache_get(cache_key)
-    if cached:
-        return cached
-
-    prompt = {
-        "role": "user",
-        "content": (
-            "You are a professional chat translator.\n"
-            "Goal: produce natural, idiomatic translations suitable for real chat.\n\n"
-            "Do this:\n"
-            "1) Detect the language of the input text.\n"
-            "2) For each target language, rewrite the message so it sounds natural to a native speaker.\n"
-            "   - Fix typos, missing punctuation, and obvious grammar issues.\n"
-            "   - Interpret idioms, slang, and regional expressions correctly.\n"
-            "   - If the original is unclear, choose the most plausible meaning and make it readable.\n"
-            "   - Keep the same intent, tone, and level of formality (do NOT over-formalize).\n"
-            "   - Preserve emojis and emphasis.\n\n"
-            "Output rules:\n"
-            "- Return ONLY valid JSON. No markdown, no code fences, no extra text.\n"
-            "- Keep each translation to a single message (no explanations).\n"
-            "- Use proper capitalization and punctuation in each language.\n\n"
-            f"Target languages (in order): {ordered_langs}\n"
-            f"Text: {text}\n\n"
-            "Return this JSON schema:\n"
-            "{\n"
-            '  "detected_language": "<language_code_or_name>",\n'
-            '  "translations": {\n'
-            '     "<lang>": "<translated_text>",\n'
-            '     "...": "..."\n'
-            "  }\n"
-            "}\n"
-        )
-    }
-
-    resp = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[prompt],
-        temperature=0.2,
-    )
-    raw = (resp.choices[0].message.content or "").strip()
+# Static instructions only: keeping this prefix byte-identical across calls lets
+# OpenAI's automatic prompt caching reuse it. Per-request data goes in the user message.
+_TRANSLATOR_RULES = (
+    "You are a professional chat translator.\n"
+    "Goal: produce natural, idiomatic translations suitable for real chat.\n\n"
+    "Do this:\n"
+    "1) Detect the language of the input text.\n"
+    "2) For each target language, rewrite the message so it sounds natural to a native speaker.\n"
+    "   - Fix typos, missing punctuation, and obvious grammar issues.\n"
+    "   - Interpret idioms, slang, and regional expressions correctly.\n"
+    "   - If the original is unclear, choose the most plausible meaning and make it readable.\n"
+    "   - Keep the same intent, tone, and level of formality (do NOT over-formalize).\n"
+    "   - Preserve emojis and emphasis.\n\n"
+    "Output rules:\n"
+    "- Return ONLY valid JSON. No markdown, no code fences, no extra text.\n"
+    "- Keep each translation to a single message (no explanations).\n"
+    "- Use proper capitalization and punctuation in each language.\n\n"
+)
+SYSTEM_PROMPT_CONTENT = _TRANSLATOR_RULES + (
+    "The user message gives the target languages (in order) and the text.\n"
+    "Return this JSON schema:\n"
+    "{\n"
+    '  "detected_language": "<language_code_or_name>",\n'
+    '  "translations": {\n'
+    '     "<lang>": "<translated_text>",\n'
+    '     "...": "..."\n'
+    "  }\n"
+    "}\n"
+)
+BATCH_SYSTEM_PROMPT_CONTENT = _TRANSLATOR_RULES + (
+    "The user message gives the target languages (in order) and a JSON array of texts, each with an id.\n"
+    "Translate each text independently and return this JSON schema:\n"
+    "{\n"
+    '  "results": [\n'
+    "    {\n"
+    '      "id": <id>,\n'
+    '      "detected_language": "<language_code_or_name>",\n'
+    '      "translations": {\n'
+    '         "<lang>": "<translated_text>",\n'
+    '         "...": "..."\n'
+    "      }\n"
+    "    }\n"
+    "  ]\n"
+    "}\n"
+)
+_SYSTEM_MSG = {"role": "system", "content": SYSTEM_PROMPT_CONTENT}
+_USER_TEMPLATE = "Target languages (in order): {langs}\nText: {text}\n"
+_BATCH_SYSTEM_MSG = {"role": "system", "content": BATCH_SYSTEM_PROMPT_CONTENT}
+_BATCH_USER_TEMPLATE = "Target languages (in order): {langs}\nTexts: {items}\n"
+
+
+def _translation_messages(text: str, ordered_langs: list[str]) -> tuple[dict, dict]:
+    user_msg = {"role": "user", "content": _USER_TEMPLATE.format(langs=ordered_langs, text=text)}
+    return (_SYSTEM_MSG, user_msg)
+
+
+def _batch_translation_messages(texts: list[str], ordered_langs: list[str]) -> tuple[dict, dict]:
+    items = orjson.dumps([{"id": i, "text": t} for i, t in enumerate(texts)]).decode("utf-8")
+    user_msg = {"role": "user", "content": _BATCH_USER_TEMPLATE.format(langs=ordered_langs, items=items)}
+    return (_BATCH_SYSTEM_MSG, user_msg)
+
+
+class TranslateOut(msgspec.Struct):
+    detected_language: str = "unknown"
+    translations: dict[str, str] = {}
+
+
+class BatchItemOut(TranslateOut):
+    id: int = -1
+
+
+class BatchOut(msgspec.Struct):
+    results: list[BatchItemOut] = []
+
+
+def _parse_translation(raw: str, ordered_langs: list[str]) -> tuple[str, dict]:
+    # Décodage + validation du schéma en une passe (msgspec.ValidationError si non conforme).
+    # Les langues omises par le modèle restent absentes (pas de "" mis en cache).
+    result = msgspec.json.decode(raw, type=TranslateOut)
+    translations = result.translations
+    return result.detected_language.strip(), {lang: translations[lang].strip() for lang in ordered_langs if lang in translations}
+
+
+def _parse_batch_translation(raw: str, ordered_langs: list[str]) -> dict:
+    # {id: (detected_language, translations)} ; les ids absents de la réponse sont omis
+    result = msgspec.json.decode(raw, type=BatchOut)
+    parsed = {}
+    for item in result.results:
+        translations = item.translations
+        parsed[item.id] = (item.detected_language.strip(), {lang: translations[lang].strip() for lang in ordered_langs if lang in translations})
+    return parsed
+
+
+def _translation_cache_items(text: str, detected_language: str, translations: dict) -> dict:
+    # Langue détectée stockée sous la langue "" ; seules les traductions non vides
+    # sont mises en cache, une langue manquante est redemandée au prochain appel.
+    digest = _text_digest(text)
+    items = {_make_cache_key(digest, ""): detected_language}
+    for lang, translated in translations.items():
+        if translated:
+            items[_make_cache_key(digest, lang)] = translated
+    return items
+
+
+def _cache_translation(text: str, detected_language: str, translations: dict):
+    # Cache désactivé : ni hachage ni écriture
+    if CACHE_TTL_SECONDS <= 0:
+        return
+    _cache_set_many(_translation_cache_items(text, detected_language, translations))
 
-    result = json.loads(raw)
-    detected_language = str(result.get("detected_language", "unknown")).strip()
-    translations = result.get("translations", {}) or {}
 
-    ordered_translations = {lang: str(translations.get(lang, "")).strip() for lang in ordered_langs}
+def _build_payload(author: str, text: str, detected_language: str, translations: dict, ordered_langs: list[str], include_line_text: bool = True) -> dict:
+    ordered_translations = {lang: translations.get(lang, "") for lang in ordered_langs}
 
     payload = {
         "author": author,
@@ -270,13 +467,296 @@ def translate_core(author: str, text: str, ordered_langs: list[str], include_lin
     if include_line_text:
         payload["line_text"] = _build_line_text(author, text, detected_language, ordered_translations, ordered_langs)
 
-    _cache_set(cache_key, payload)
     return payload
 
 
-def translate_text(author: str, text: str) -> str:
-    payload = translate_core(author, text, DEFAULT_LANGS, include_line_text=True)
-    return payload.get("line_text") or "Translation unavailable."
+class TranslationTruncatedError(RuntimeError):
+    # Réponse coupée à max_tokens (finish_reason == "length") : JSON incomplet
+    pass
+
+
+def _max_output_tokens(text: str, ordered_langs: list[str]) -> int:
+    # Borne haute : ~2 tokens/caractère par langue (écritures non latines) + enveloppe JSON
+    return min(4096, 64 + len(ordered_langs) * (16 + 2 * len(text)))
+
+
+def _chat_json(messages, max_tokens: int) -> str:
+    buf = io.StringIO()
+    finish_reason = None
+    with _OPENAI_SEMAPHORE:
+        stream = _get_openai_client().chat.completions.create(
+            model=MODEL_NAME,
+            messages=messages,
+            temperature=0,
+            seed=0,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices:
+                choice = chunk.choices[0]
+                buf.write(choice.delta.content or "")
+                finish_reason = choice.finish_reason or finish_reason
+    if finish_reason == "length":
+        raise TranslationTruncatedError(f"OpenAI response was cut off at max_tokens={max_tokens}")
+    return buf.getvalue().strip()
+
+
+def _budget_chunks(texts: list[str], ordered_langs: list[str]):
+    # Découpe en paquets (start, end) dont la réponse tient dans max_tokens
+    start, budget = 0, 0
+    for i, text in enumerate(texts):
+        cost = _max_output_tokens(text, ordered_langs)
+        if i > start and budget + cost > 4096:
+            yield start, i
+            start, budget = i, 0
+        budget += cost
+    if start < len(texts):
+        yield start, len(texts)
+
+
+def _translate_one(text: str, ordered_langs: list[str]) -> tuple[str, dict]:
+    # Réponse coupée : la liste de langues est coupée en deux et chaque moitié retraduite
+    try:
+        raw = _chat_json(_translation_messages(text, ordered_langs), _max_output_tokens(text, ordered_langs))
+    except TranslationTruncatedError:
+        if len(ordered_langs) < 2:
+            raise
+        mid = len(ordered_langs) // 2
+        detected_language, translations = _translate_one(text, ordered_langs[:mid])
+        translations.update(_translate_one(text, ordered_langs[mid:])[1])
+        return detected_language, translations
+    return _parse_translation(raw, ordered_langs)
+
+
+def _translate_batch(texts: list[str], ordered_langs: list[str]) -> list[tuple[str, dict]]:
+    # Un appel par paquet de textes ; un élément manquant dans la réponse
+    # groupée (ou une réponse coupée) est retraduit individuellement.
+    if len(texts) == 1:
+        return [_translate_one(texts[0], ordered_langs)]
+
+    results = []
+    for start, end in _budget_chunks(texts, ordered_langs):
+        chunk = texts[start:end]
+        if len(chunk) == 1:
+            results.extend(_translate_batch(chunk, ordered_langs))
+            continue
+
+        max_tokens = min(4096, sum(_max_output_tokens(t, ordered_langs) for t in chunk))
+        try:
+            raw = _chat_json(_batch_translation_messages(chunk, ordered_langs), max_tokens)
+        except TranslationTruncatedError:
+            results.extend(_translate_one(text, ordered_langs) for text in chunk)
+            continue
+        parsed = _parse_batch_translation(raw, ordered_langs)
+        for i, text in enumerate(chunk):
+            results.append(parsed[i] if i in parsed else _translate_batch([text], ordered_langs)[0])
+    return results
+
+
+_URL_RE = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+
+
+def _is_noop(text: str) -> bool:
+    # Rien à traduire : emojis, ponctuation, chiffres ou liens uniquement
+    return not any(ch.isalpha() for ch in _URL_RE.sub("", text))
+
+
+def _cached_translation(text: str, ordered_langs: list[str]) -> tuple[str | None, dict, list[str]]:
+    # (langue détectée ou None, traductions en cache, langues manquantes)
+    if CACHE_TTL_SECONDS <= 0:
+        return None, {}, list(ordered_langs)
+
+    digest = _text_digest(text)
+    detected_key = _make_cache_key(digest, "")
+    pair_keys = {lang: _make_cache_key(digest, lang) for lang in ordered_langs}
+    hits = _cache_get_many([detected_key, *pair_keys.values()])
+
+    translations = {lang: hits[key] for lang, key in pair_keys.items() if key in hits}
+    missing = [lang for lang in ordered_langs if lang not in translations]
+    return hits.get(detected_key), translations, missing
+
+
+def _translate_missing(text: str, missing: list[str], coalesce: bool) -> tuple[str, dict]:
+    if coalesce:
+        new_detected, new_translations = _coalesce_submit(text, missing).result()
+    else:
+        new_detected, new_translations = _translate_one(text, missing)
+    _cache_translation(text, new_detected, new_translations)
+    return new_detected, new_translations
+
+
+def translate_core(author: str, text: str, ordered_langs: list[str], include_line_text: bool = True, coalesce: bool = False) -> dict:
+    if _is_noop(text):
+        return _build_payload(author, text, "unknown", {lang: text for lang in ordered_langs}, ordered_langs, include_line_text)
+
+    detected_language, translations, missing = _cached_translation(text, ordered_langs)
+
+    # Seules les langues absentes du cache partent chez OpenAI
+    if missing:
+        new_detected, new_translations = _singleflight(("translate", text, tuple(missing)), _translate_missing, text, missing, coalesce)
+        translations.update(new_translations)
+        detected_language = detected_language or new_detected
+
+    return _build_payload(author, text, detected_language or "unknown", translations, ordered_langs, include_line_text)
+
+
+def _translate_group(texts: list[str], ordered_langs: list[str]) -> dict:
+    # {text: (detected_language, translations) ou exception} : un appel groupé,
+    # puis texte par texte si l'appel groupé échoue
+    try:
+        return dict(zip(texts, _translate_batch(texts, ordered_langs)))
+    except Exception as e:
+        if len(texts) == 1:
+            print("TRANSLATE ERROR:", traceback.format_exc())
+            return {texts[0]: e}
+        print("BATCH TRANSLATE ERROR:", traceback.format_exc())
+
+    outcomes = {}
+    for text in texts:
+        try:
+            outcomes[text] = _translate_batch([text], ordered_langs)[0]
+        except Exception as e:
+            print("TRANSLATE ERROR:", traceback.format_exc())
+            outcomes[text] = e
+    return outcomes
+
+
+def translate_many(texts: list[str], ordered_langs: list[str]) -> dict:
+    # {text: (detected_language, translations)} pour plusieurs messages : seuls les
+    # textes absents du cache partent chez OpenAI, en un appel groupé par jeu de
+    # langues manquantes. Si l'appel groupé échoue, chaque texte est retenté seul ;
+    # seuls les textes encore en échec sont omis du résultat.
+    results = {}
+    pending = {}  # {tuple(missing_langs): [text, ...]}
+    for text in dict.fromkeys(texts):
+        if _is_noop(text):
+            results[text] = ("unknown", {lang: text for lang in ordered_langs})
+            continue
+        detected_language, translations, missing = _cached_translation(text, ordered_langs)
+        results[text] = (detected_language, translations)
+        if missing:
+            pending.setdefault(tuple(missing), []).append(text)
+
+    for missing, group in pending.items():
+        # Même clé que translate_core : un texte déjà en cours de traduction
+        # (autre livraison webhook, /translate) n'est pas redemandé
+        claimed, joined = [], []
+        for text in group:
+            key = ("translate", text, missing)
+            future, leader = _singleflight_join(key)
+            (claimed if leader else joined).append((text, key, future))
+
+        outcomes = {}
+        try:
+            if claimed:
+                outcomes = _translate_group([text for text, _, _ in claimed], list(missing))
+        finally:
+            for text, key, future in claimed:
+                outcome = outcomes.get(text) or RuntimeError("translation interrupted")
+                if not isinstance(outcome, BaseException):
+                    try:
+                        _cache_translation(text, *outcome)
+                    except Exception:
+                        print("CACHE ERROR:", traceback.format_exc())
+                _singleflight_settle(key, future, outcome)
+
+        for text, _, future in claimed + joined:
+            try:
+                new_detected, new_translations = future.result()
+            except Exception:
+                results.pop(text, None)
+                continue
+            detected_language, translations = results[text]
+            translations.update(new_translations)
+            results[text] = (detected_language or new_detected, translations)
+
+    return {text: (detected_language or "unknown", translations) for text, (detected_language, translations) in results.items()}
+
+
+# -------------------------
+# COALESCER (mode=throughput)
+# -------------------------
+_COALESCE_QUEUE = queue.Queue()  # (text, ordered_langs, Future)
+# Paquets exécutés sur un pool borné (les appels OpenAI restent limités par le sémaphore)
+_COALESCE_EXECUTOR = ThreadPoolExecutor(max_workers=OPENAI_MAX_CONCURRENCY, thread_name_prefix="coalesce")
+_COALESCER_LOCK = threading.Lock()
+_coalescer_thread = None
+
+
+def _coalesce_submit(text: str, ordered_langs: list[str]) -> Future:
+    global _coalescer_thread
+
+    with _COALESCER_LOCK:
+        if _coalescer_thread is None:
+            _coalescer_thread = threading.Thread(target=_coalescer, daemon=True)
+            _coalescer_thread.start()
+
+    future = Future()
+    _COALESCE_QUEUE.put((text, ordered_langs, future))
+    return future
+
+
+def _coalescer():
+    while True:
+        pending = [_COALESCE_QUEUE.get()]
+        deadline = time.monotonic() + COALESCE_MS / 1000
+        while len(pending) < COALESCE_MAX_ITEMS:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                pending.append(_COALESCE_QUEUE.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        # Un appel par jeu de langues, découpé pour tenir dans max_tokens
+        groups = {}
+        for text, ordered_langs, future in pending:
+            groups.setdefault(tuple(ordered_langs), []).append((text, future))
+
+        for langs, items in groups.items():
+            for start, end in _budget_chunks([text for text, _ in items], list(langs)):
+                _COALESCE_EXECUTOR.submit(_run_coalesced, items[start:end], list(langs))
+
+
+def _run_coalesced(items: list[tuple[str, Future]], ordered_langs: list[str]):
+    # Si l'appel groupé échoue, chaque texte est retenté seul ;
+    # seuls les appelants encore en échec reçoivent l'exception.
+    try:
+        results = _translate_batch([text for text, _ in items], ordered_langs)
+    except Exception as e:
+        if len(items) == 1:
+            items[0][1].set_exception(e)
+            return
+        print("COALESCE TRANSLATE ERROR:", traceback.format_exc())
+        results = None
+
+    if results is not None:
+        for (_, future), result in zip(items, results):
+            future.set_result(result)
+        return
+
+    for text, future in items:
+        try:
+            result = _translate_batch([text], ordered_langs)[0]
+        except Exception as e:
+            future.set_exception(e)
+            continue
+        future.set_result(result)
+
+
+# -------------------------
+# REQUEST HELPERS
+# -------------------------
+def _normalize_langs(languages: list[str]) -> list[str]:
+    common = _COMMON_LANG_TUPLES.get(tuple(languages))
+    if common is not None:
+        return common
+
+    key = tuple(sys.intern(x.strip().lower()) for x in languages if x and x.strip())
+    return _COMMON_LANG_TUPLES.get(key) or list(key) or DEFAULT_LANGS
 
 
 # -------------------------
@@ -292,11 +772,18 @@ def health_check():
 # -------------------------
 @app.route("/translate", methods=["POST"])
 def translate():
-    data = request.json or {}
-    author = data.get("author", "Unknown")
-    text = (data.get("text") or "").strip()
+    try:
+        data = orjson.loads(request.get_data()) if request.data else {}
+    except orjson.JSONDecodeError:
+        return jsonify({"error": "Invalid JSON body"}), 400
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid JSON body"}), 400
+
+    author = str(data.get("author") or "Unknown")
+    text = (data.get("text") or "").strip()[:MAX_TEXT_CHARS]
     languages = data.get("languages") or DEFAULT_LANGS
     include_line_text = bool(data.get("include_line_text", True))
+    mode = request.args.get("mode", "latency")
 
     if not text:
         return jsonify({"error": "No text provided"}), 400
@@ -304,34 +791,200 @@ def translate():
     if not isinstance(languages, list) or not all(isinstance(x, str) for x in languages):
         return jsonify({"error": "languages must be a list of strings"}), 400
 
-    ordered_langs = [x.strip() for x in languages if x and x.strip()] or DEFAULT_LANGS
+    if mode not in ("latency", "throughput"):
+        return jsonify({"error": "mode must be 'latency' or 'throughput'"}), 400
+
+    ordered_langs = _normalize_langs(languages)
 
     try:
-        payload = translate_core(author, text, ordered_langs, include_line_text=include_line_text)
+        payload = translate_core(author, text, ordered_langs, include_line_text=include_line_text, coalesce=mode == "throughput")
         return jsonify(payload), 200
-    except json.JSONDecodeError:
+    except msgspec.ValidationError:
+        return jsonify({"error": "internal_error", "details": "OpenAI response did not match the expected schema"}), 500
+    except msgspec.DecodeError:
         return jsonify({"error": "internal_error", "details": "OpenAI response was not valid JSON"}), 500
     except Exception as e:
         return jsonify({"error": "internal_error", "details": str(e)}), 500
 
 
 # -------------------------
-# ASYNC WORKER
+# BATCH API (bulk, non-interactive: up to 24h, half price)
 # -------------------------
-def _process_event_async(reply_token: str, to_id: str, author: str, text: str):
+@app.route("/translate/batch", methods=["POST"])
+def translate_batch():
     try:
-        # Traduire
-        line_text = translate_text(author, text)
+        data = orjson.loads(request.get_data()) if request.data else {}
+    except orjson.JSONDecodeError:
+        return jsonify({"error": "Invalid JSON body"}), 400
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid JSON body"}), 400
 
-        # 1) Essayer de répondre via replyToken (dans le même chat)
-        ok = reply_to_line(reply_token, line_text)
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list"}), 400
 
-        # 2) Fallback push si replyToken expiré / reply fail
-        if not ok:
-            push_to_line(to_id, line_text)
+    jobs = {}  # {custom_id: (text, ordered_langs)}
+    custom_ids = []
+    for item in items:
+        if not isinstance(item, dict):
+            return jsonify({"error": "each item must be an object"}), 400
 
+        text = (item.get("text") or "").strip()[:MAX_TEXT_CHARS]
+        languages = item.get("languages") or DEFAULT_LANGS
+
+        if not text:
+            return jsonify({"error": "No text provided"}), 400
+
+        if not isinstance(languages, list) or not all(isinstance(x, str) for x in languages):
+            return jsonify({"error": "languages must be a list of strings"}), 400
+
+        ordered_langs = _normalize_langs(languages)
+        custom_id = _make_cache_key(_text_digest(text), ",".join(ordered_langs))
+        jobs[custom_id] = (text, ordered_langs)
+        custom_ids.append(custom_id)
+
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".jsonl") as fp:
+            for custom_id, (text, ordered_langs) in jobs.items():
+                line = {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": MODEL_NAME,
+                        "messages": _translation_messages(text, ordered_langs),
+                        "temperature": 0,
+                        "seed": 0,
+                        "max_tokens": _max_output_tokens(text, ordered_langs),
+                        "response_format": {"type": "json_object"},
+                    },
+                }
+                fp.write(orjson.dumps(line) + b"\n")
+            fp.flush()
+            fp.seek(0)
+            input_file = _get_openai_client().files.create(file=fp, purpose="batch")
+
+        batch = _get_openai_client().batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+    except Exception as e:
+        return jsonify({"error": "internal_error", "details": str(e)}), 500
+
+    with _BATCH_JOBS_LOCK:
+        BATCH_JOBS[batch.id] = jobs
+    return jsonify({"batch_id": batch.id, "status": batch.status, "custom_ids": custom_ids}), 202
+
+
+@app.route("/translate/batch/<batch_id>", methods=["GET"])
+def translate_batch_status(batch_id: str):
+    try:
+        batch = _get_openai_client().batches.retrieve(batch_id)
+    except Exception as e:
+        return jsonify({"error": "internal_error", "details": str(e)}), 500
+
+    counts = batch.request_counts
+    response = {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "request_counts": counts.model_dump() if counts else None,
+    }
+    if batch.status != "completed" or not batch.output_file_id:
+        return jsonify(response), 200
+
+    try:
+        output = _get_openai_client().files.content(batch.output_file_id).text
+    except Exception as e:
+        return jsonify({"error": "internal_error", "details": str(e)}), 500
+
+    # Les jobs ne sont connus que du worker qui a soumis le batch (gardés jusqu'au TTL) :
+    # les autres renvoient les mêmes champs, sans texte original ni cache.
+    with _BATCH_JOBS_LOCK:
+        jobs = BATCH_JOBS.get(batch_id) or {}
+    results = []
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            row = None
+        if not isinstance(row, dict):
+            results.append({"custom_id": None, "error": "invalid output line"})
+            continue
+        custom_id = row.get("custom_id")
+        response_row = row.get("response") or {}
+        body = response_row.get("body") if isinstance(response_row, dict) else None
+        body = body if isinstance(body, dict) else {}
+        try:
+            choice = body["choices"][0]
+            raw = (choice["message"]["content"] or "").strip()
+        except (KeyError, IndexError, TypeError):
+            results.append({"custom_id": custom_id, "error": row.get("error") or body.get("error") or "no output"})
+            continue
+        if choice.get("finish_reason") == "length":
+            results.append({"custom_id": custom_id, "error": "OpenAI response was cut off at max_tokens"})
+            continue
+
+        # Job inconnu (autre worker, TTL expiré) : langues relues dans le custom_id
+        # ("<digest>:<lang,lang>"), texte original indisponible
+        text, ordered_langs = jobs.get(custom_id) or (None, str(custom_id).partition(":")[2].split(","))
+        try:
+            detected_language, translations = _parse_translation(raw, ordered_langs)
+            if text is not None:
+                _cache_translation(text, detected_language, translations)
+            payload = {"original_text": text, "detected_language": detected_language, "translations": {lang: translations.get(lang, "") for lang in ordered_langs}}
+        except msgspec.ValidationError:
+            results.append({"custom_id": custom_id, "error": "OpenAI response did not match the expected schema"})
+            continue
+        except msgspec.DecodeError:
+            results.append({"custom_id": custom_id, "error": "OpenAI response was not valid JSON"})
+            continue
+
+        results.append({"custom_id": custom_id, **payload})
+
+    response["results"] = results
+    return jsonify(response), 200
+
+
+# -------------------------
+# ASYNC WORKER
+# -------------------------
+def _process_events_async(events: list[tuple[str, str, str, str]]):
+    # Traduire tous les messages du webhook en un seul appel groupé
+    try:
+        results = translate_many([text for _, _, _, text in events], DEFAULT_LANGS)
     except Exception:
         print("ASYNC ERROR:", traceback.format_exc())
+        return
+
+    for reply_token, to_id, user_id, text in events:
+        try:
+            if text not in results:
+                continue
+            detected_language, translations = results[text]
+
+            # Profil LINE (auteur) récupéré ici, pas dans le webhook
+            profile = get_line_profile(user_id)
+            author = profile.get("displayName") or (f"User-{user_id[-4:]}" if user_id else "Unknown")
+
+            line_text = _build_line_text(author, text, detected_language, translations, DEFAULT_LANGS)
+
+            # 1) Essayer de répondre via replyToken (dans le même chat)
+            ok = reply_to_line(reply_token, line_text)
+
+            # 2) Fallback push si replyToken expiré / reply fail
+            if not ok:
+                push_to_line(to_id, line_text)
+
+        except Exception:
+            print("ASYNC ERROR:", traceback.format_exc())
+
+
+def _reply_busy(reply_tokens: list[str]):
+    for reply_token in reply_tokens:
+        reply_to_line(reply_token, BUSY_MESSAGE)
 
 
 # -------------------------
@@ -339,19 +992,23 @@ def _process_event_async(reply_token: str, to_id: str, author: str, text: str):
 # -------------------------
 @app.route("/webhook", methods=["POST"])
 def webhook():
+    if (request.content_length or 0) > WEBHOOK_MAX_BYTES:
+        return "Too large", 413
     raw_body = request.get_data()
+    if len(raw_body) > WEBHOOK_MAX_BYTES:
+        return "Too large", 413
     signature = request.headers.get("X-Line-Signature", "")
-    channel_secret = os.environ.get("LINE_CHANNEL_SECRET", "")
 
-    if not verify_line_signature(raw_body, signature, channel_secret):
+    if not verify_line_signature(raw_body, signature, LINE_CHANNEL_SECRET):
         return "Invalid signature", 400
 
     try:
-        body = json.loads(raw_body.decode("utf-8"))
+        body = orjson.loads(raw_body)
     except Exception:
         return "Bad request", 400
 
     events = body.get("events", []) or []
+    pending = []  # (reply_token, to_id, user_id, text)
     for event in events:
         try:
             if event.get("type") != "message":
@@ -377,31 +1034,34 @@ def webhook():
                 continue
 
             user_id = source.get("userId", "")
-            profile = get_line_profile(user_id)
-            author = profile.get("displayName") or (f"User-{user_id[-4:]}" if user_id else "Unknown")
 
-            text = (message.get("text") or "").strip()
+            text = (message.get("text") or "").strip()[:MAX_TEXT_CHARS]
             if not text:
                 continue
 
-            # Thread (200 OK immédiat)
-            t = threading.Thread(
-                target=_process_event_async,
-                args=(reply_token, to_id, author, text),
-                daemon=True
-            )
-            t.start()
+            pending.append((reply_token, to_id, user_id, text))
 
         except Exception:
             print("WEBHOOK EVENT ERROR:", traceback.format_exc())
             continue
 
+    # File bornée (200 OK immédiat) ; si elle est pleine, prévenir et abandonner
+    if pending:
+        if _QUEUE_SLOTS.acquire(blocking=False):
+            job = EXECUTOR.submit(_process_events_async, pending)
+            job.add_done_callback(lambda _: _QUEUE_SLOTS.release())
+        else:
+            # Réponses "busy" hors du thread de requête : le 200 part sans attendre LINE
+            print("WEBHOOK BUSY: dropping", len(pending), "event(s)")
+            threading.Thread(target=_reply_busy, args=([reply_token for reply_token, _, _, _ in pending],), daemon=True).start()
+
     return "OK", 200
 
 
 # -------------------------
 # ENTRYPOINT
 # -------------------------
+# Dev local uniquement ; en prod : gunicorn (voir Procfile)
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
-    app.run(host="0.0.0.0", port=port)
+    app.run(host="0.0.0.0", port=port, threaded=True)